@@ -1,25 +1,30 @@
 import streamlit as st
 import pandas as pd
+import os
 
-df = pd.read_csv('discharge_data.csv')
+@st.cache_data(show_spinner=False)
+def _load(csv_filename, mtime):
+    return pd.read_csv(csv_filename)
+
+# Define custom CSS for background color and text color
+_CSS = """
+<style>
+    .stApp {
+        background-color: black;
+        color: white;
+    }
+    .stMarkdown h1, h2, h3, h4, h5, h6, p {
+        color: white;
+    }
+</style>
+"""
 
 # Streamlit UI
 st.set_page_config(page_title="Spillway Discharge Calculation", page_icon="🚗", initial_sidebar_state="collapsed")
 
-# Define custom CSS for background color and text color
-st.markdown(
-    f"""
-    <style>
-        .stApp {{
-            background-color: black;
-            color: white;
-        }}
-        .stMarkdown h1, h2, h3, h4, h5, h6, p {{
-            color: white;
-        }}
-    </style>
-    """, unsafe_allow_html=True
-)
+df = _load('discharge_data.csv', os.path.getmtime('discharge_data.csv'))
+
+st.markdown(_CSS, unsafe_allow_html=True)
 
 
 st.title('Used Car Price Prediction App')
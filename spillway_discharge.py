@@ -1,9 +1,11 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
+import time
 import os
+import threading
 
 # Page configuration
 st.set_page_config(
@@ -12,73 +14,114 @@ st.set_page_config(
     layout="wide"
 )
 
+_FOOTER = """
+**Formula Used:** `Total Discharge = (Number of Gates × Duration × CFS Value) ÷ (16 × 24)`
+
+**Note:** If exact height match is not found in the dataset, the CFS value is linearly interpolated between the neighboring heights.
+"""
+
+# Serializes sample CSV creation across concurrent sessions
+_sample_csv_lock = threading.Lock()
+
+@st.cache_data(show_spinner=False)
+def read_discharge_csv(csv_filename, mtime):
+    """Read the discharge table, cached per file path and modification time."""
+    df = pd.read_csv(
+        csv_filename,
+        usecols=['height', 'cfs'],
+        dtype={'height': np.float64, 'cfs': np.float64},
+        engine='c'
+    )
+    # Pre-divide by (16 * 24) so the discharge formula is a plain product
+    df['cfs_per_unit'] = df['cfs'] / 384.0
+    return df
+
+@st.cache_data(show_spinner=False)
+def build_height_lookup(csv_filename, mtime):
+    """Build the sorted height/CFS arrays used by get_cfs_for_height, cached like read_discharge_csv."""
+    sorted_data = read_discharge_csv(csv_filename, mtime).sort_values('height')
+    heights = sorted_data['height'].to_numpy()
+    return heights, sorted_data['cfs_per_unit'].to_numpy(), set(heights.tolist())
+
 class StreamlitSpillwayCalculator:
+    # Calculations are stored column-wise in session state, one list per field
+    CALCULATION_FIELDS = ['timestamp', 'num_gates', 'duration', 'gate_height', 'cfs_value', 'discharge', 'exact_match']
+    
     def __init__(self):
         self.csv_filename = "./discharge_list.csv"
         self.initialize_session_state()
         
     def initialize_session_state(self):
         """Initialize session state variables."""
-        if 'calculations' not in st.session_state:
-            st.session_state.calculations = []
-        if 'total_discharge' not in st.session_state:
-            st.session_state.total_discharge = 0.0
+        if 'cols' not in st.session_state:
+            st.session_state.cols = {field: [] for field in self.CALCULATION_FIELDS}
+        if 'calc_version' not in st.session_state:
+            st.session_state.calc_version = 0
+        if 'results_cache' not in st.session_state:
+            st.session_state.results_cache = None
         if 'discharge_data' not in st.session_state:
             st.session_state.discharge_data = None
             
     def create_sample_csv(self):
         """Create a sample CSV file with the provided data."""
-        sample_data = {
-            'height': [0.50, 1.00, 1.50, 2.00, 2.50, 3.00],
-            'cfs': [9000, 18000, 29000, 38000, 49000, 58000]
-        }
-        df = pd.DataFrame(sample_data)
-        df.to_csv(self.csv_filename, index=False)
-        return df
+        with _sample_csv_lock:
+            # Another session may have created the file while we waited
+            if not os.path.exists(self.csv_filename):
+                sample_data = {
+                    'height': [0.50, 1.00, 1.50, 2.00, 2.50, 3.00],
+                    'cfs': [9000, 18000, 29000, 38000, 49000, 58000]
+                }
+                df = pd.DataFrame(sample_data)
+                tmp_filename = self.csv_filename + ".tmp"
+                df.to_csv(tmp_filename, index=False)
+                os.replace(tmp_filename, self.csv_filename)
         
     def load_discharge_data(self):
         """Load discharge data from CSV file."""
         try:
             if not os.path.exists(self.csv_filename):
                 st.warning(f"CSV file '{self.csv_filename}' not found. Creating sample file...")
-                return self.create_sample_csv()
+                self.create_sample_csv()
             
-            df = pd.read_csv(self.csv_filename)
-            return df
+            mtime = os.path.getmtime(self.csv_filename)
+            df = read_discharge_csv(self.csv_filename, mtime)
+            self._h, self._u, self._height_set = build_height_lookup(self.csv_filename, mtime)
         except Exception as e:
+            # Never replace an existing data file with the sample table
             st.error(f"Error loading CSV file: {e}")
-            return self.create_sample_csv()
-    
-    def get_cfs_for_height(self, height, discharge_data):
-        """Get CFS value for a given height from the dataset."""
-        # Find exact match first
-        exact_match = discharge_data[discharge_data['height'] == height]
-        if not exact_match.empty:
-            return exact_match['cfs'].iloc[0], True
+            st.stop()
         
-        # If no exact match, find the closest height
-        closest_idx = (discharge_data['height'] - height).abs().idxmin()
-        closest_height = discharge_data.loc[closest_idx, 'height']
-        closest_cfs = discharge_data.loc[closest_idx, 'cfs']
+        return df
+    
+    def get_cfs_for_height(self, height):
+        """Get the CFS value per discharge unit for a height, interpolating between tabulated heights.
         
-        return closest_cfs, False
+        Returns the CFS value divided by (16 * 24), whether the height is in the
+        dataset, and the height actually used (clamped to the dataset's range, as
+        np.interp does).
+        """
+        matched_height = min(max(height, self._h[0]), self._h[-1])
+        return float(np.interp(height, self._h, self._u)), height in self._height_set, float(matched_height)
     
-    def calculate_discharge(self, num_gates, duration, gate_height, discharge_data):
+    def calculate_discharge(self, num_gates, duration, gate_height):
         """Calculate total discharge using the formula."""
-        cfs_value, exact_match = self.get_cfs_for_height(gate_height, discharge_data)
+        cfs_per_unit, exact_match, matched_height = self.get_cfs_for_height(gate_height)
+        cfs_value = cfs_per_unit * 384.0
         
-        # Apply the formula: (no of gates * duration * cfs_value) / (16*24)
+        # Apply the formula: (no of gates * duration * cfs_value) / (16*24),
+        # with the division already folded into cfs_per_unit
         # Step 7: Add all discharge values for multiple calculations
-        discharge = (num_gates * duration * cfs_value) / (16 * 24)
+        discharge = num_gates * duration * cfs_per_unit
         
         return {
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
             'num_gates': num_gates,
             'duration': duration,
             'gate_height': gate_height,
             'cfs_value': cfs_value,
             'discharge': discharge,
-            'exact_match': exact_match
+            'exact_match': exact_match,
+            'matched_height': matched_height
         }
     
     def display_discharge_chart(self, discharge_data):
@@ -98,17 +141,27 @@ class StreamlitSpillwayCalculator:
         )
         return fig
     
+    def record_calculation(self, result):
+        """Append a calculation result to the session state columns."""
+        for field, values in st.session_state.cols.items():
+            values.append(result[field])
+        st.session_state.calc_version += 1
+    
+    def clear_calculations(self):
+        """Remove all calculations from session state."""
+        st.session_state.cols = {field: [] for field in self.CALCULATION_FIELDS}
+        st.session_state.calc_version += 1
+    
     def display_calculations_chart(self):
         """Display a chart of all calculations performed."""
-        if len(st.session_state.calculations) > 0:
-            df = pd.DataFrame(st.session_state.calculations)
-            
+        discharges = np.asarray(st.session_state.cols['discharge'], dtype=np.float64)
+        if len(discharges) > 0:
             fig = go.Figure()
             fig.add_trace(go.Bar(
-                x=[f"Calc {i+1}" for i in range(len(df))],
-                y=df['discharge'],
+                x=[f"Calc {i+1}" for i in range(len(discharges))],
+                y=discharges,
                 name='Individual Discharge',
-                text=[f"{val:,.1f}" for val in df['discharge']],
+                text=[f"{val:,.1f}" for val in discharges],
                 textposition='auto',
             ))
             
@@ -120,6 +173,30 @@ class StreamlitSpillwayCalculator:
             )
             return fig
         return None
+    
+    def get_results(self):
+        """Return the summary, results table and CSV, rebuilt only when the calculations change."""
+        key = st.session_state.calc_version
+        if st.session_state.results_cache is None or st.session_state.results_cache[0] != key:
+            cols = st.session_state.cols
+            discharges = np.asarray(cols['discharge'], dtype=np.float64)
+            # Copy the columns so later appends can't change the cached table
+            table = {
+                'Timestamp': list(cols['timestamp']),
+                'Gates': list(cols['num_gates']),
+                'Duration (hrs)': list(cols['duration']),
+                'Height': list(cols['gate_height']),
+                'CFS Value': list(cols['cfs_value']),
+                'Discharge': list(cols['discharge'])
+            }
+            results = {
+                'total_discharge': discharges.sum(),
+                'avg_discharge': discharges.mean(),
+                'table': table,
+                'csv': pd.DataFrame(table).to_csv(index=False)
+            }
+            st.session_state.results_cache = (key, results)
+        return st.session_state.results_cache[1]
 
 def main():
     calculator = StreamlitSpillwayCalculator()
@@ -167,6 +244,8 @@ def main():
             step=0.1,
             help="Enter the gate opening height"
         )
+        # Strip float noise so it doesn't defeat the exact match, keeping the typed digits
+        gate_height = round(gate_height, 6)
     
 
     
@@ -175,24 +254,23 @@ def main():
     with col_btn1:
         if st.button("🧮 Calculate Discharge", type="primary", use_container_width=True):
             result = calculator.calculate_discharge(
-                num_gates, duration, gate_height, discharge_data
+                num_gates, duration, gate_height
             )
             
-            # Step 7: Add to session state and accumulate total discharge
-            st.session_state.calculations.append(result)
-            st.session_state.total_discharge += result['discharge']
+            # Step 7: Add to session state; totals are summed from the stored discharges
+            calculator.record_calculation(result)
             
             st.success(f"✅ Calculation completed! Individual discharge: {result['discharge']:,.2f}")
             
             # Show warning if height was approximated
-            if not result['exact_match']:
-                closest_height = discharge_data.loc[(discharge_data['height'] - gate_height).abs().idxmin(), 'height']
-                st.warning(f"⚠️ Using closest available height: {closest_height} (CFS: {result['cfs_value']:,})")
+            if result['matched_height'] != gate_height:
+                st.warning(f"⚠️ Height outside dataset range, using closest available height: {result['matched_height']} (CFS: {result['cfs_value']:,.0f})")
+            elif not result['exact_match']:
+                st.warning(f"⚠️ Height {gate_height} not in dataset, using interpolated CFS: {result['cfs_value']:,.0f}")
     
     with col_btn2:
         if st.button("🗑️ Clear All Calculations", use_container_width=True):
-            st.session_state.calculations = []
-            st.session_state.total_discharge = 0.0
+            calculator.clear_calculations()
             st.success("🧹 All calculations cleared!")
     
     st.markdown("---")
@@ -200,34 +278,35 @@ def main():
     # Results section
     st.header("📋 Calculation Results")
     
-    if len(st.session_state.calculations) > 0:
+    num_calculations = len(st.session_state.cols['discharge'])
+    if num_calculations > 0:
+        results = calculator.get_results()
+        
         # Summary metrics
         col_x, col_y, col_z = st.columns(3)
         with col_x:
-            st.metric("Total Calculations", len(st.session_state.calculations))
+            st.metric("Total Calculations", num_calculations)
         with col_y:
-            st.metric("Total Discharge", f"{st.session_state.total_discharge:,.2f}")
+            st.metric("Total Discharge", f"{results['total_discharge']:,.2f}")
         with col_z:
-            avg_discharge = st.session_state.total_discharge / len(st.session_state.calculations)
-            st.metric("Average Discharge", f"{avg_discharge:,.2f}")
-        
-        # Results table
-        results_df = pd.DataFrame(st.session_state.calculations)
-        results_df = results_df[['timestamp', 'num_gates', 'duration', 'gate_height', 'cfs_value', 'discharge']]
-        results_df.columns = ['Timestamp', 'Gates', 'Duration (hrs)', 'Height', 'CFS Value', 'Discharge']
+            st.metric("Average Discharge", f"{results['avg_discharge']:,.2f}")
         
-        # Format the dataframe
-        results_df['CFS Value'] = results_df['CFS Value'].apply(lambda x: f"{x:,}")
-        results_df['Discharge'] = results_df['Discharge'].apply(lambda x: f"{x:,.2f}")
-        
-        st.dataframe(results_df, use_container_width=True, hide_index=True)
+        # Results table, formatting the numeric columns client-side
+        st.dataframe(
+            results['table'],
+            column_config={
+                'CFS Value': st.column_config.NumberColumn(format="%d"),
+                'Discharge': st.column_config.NumberColumn(format="%.2f")
+            },
+            use_container_width=True,
+            hide_index=True
+        )
         
         # Download button
-        csv = results_df.to_csv(index=False)
         st.download_button(
             label="📥 Download Results as CSV",
-            data=csv,
-            file_name=f"spillway_calculations_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            data=results['csv'],
+            file_name=f"spillway_calculations_{time.strftime('%Y%m%d_%H%M%S')}.csv",
             mime="text/csv"
         )
     else:
@@ -235,13 +314,7 @@ def main():
     
     # Footer
     st.markdown("---")
-    st.markdown(
-        """
-        **Formula Used:** `Total Discharge = (Number of Gates × Duration × CFS Value) ÷ (16 × 24)`
-        
-        **Note:** If exact height match is not found in the dataset, the closest available value is used.
-        """
-    )
+    st.markdown(_FOOTER)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,11 +1,18 @@
 import streamlit as st
 import pandas as pd
+import os
+import numpy as np
 
-df = pd.read_csv('discharge_data.csv')
+@st.cache_data(show_spinner=False)
+def _load(csv_filename, mtime):
+    df = pd.read_csv(csv_filename, usecols=['height', 'cfs'], dtype={'height': np.float64, 'cfs': np.float64})
+    return df, dict(zip(df['height'].to_numpy(), df['cfs'].to_numpy()))
 
 # Streamlit UI
 st.set_page_config(page_title="Spillway Discharge Calculation", page_icon="🌊", initial_sidebar_state="collapsed")
 
+df, h2cfs = _load('discharge_data.csv', os.path.getmtime('discharge_data.csv'))
+
 st.title('Spillway Discharge Calculation')
 
 # Sidebar with links
@@ -60,7 +67,12 @@ if len(st.session_state.calculations) < 16:
     if st.button('Add Another Calculation'):
         add_calculation()
 
-# Calculate the total SPD rate
-total_spd = sum((calc['num_of_gates'] * calc['duration'] * df[df['height'] == calc['gate_height']].iloc[0, 1]) / 384 for calc in st.session_state.calculations if calc['num_of_gates'] is not None and calc['duration'] is not None and calc['gate_height'] is not None and not df[df['height'] == calc['gate_height']].empty)
+# Calculate the total SPD rate (None entries become NaN in the float arrays)
+gates = np.array([calc['num_of_gates'] for calc in st.session_state.calculations], dtype=np.float64)
+durs = np.array([calc['duration'] for calc in st.session_state.calculations], dtype=np.float64)
+heights = np.array([calc['gate_height'] for calc in st.session_state.calculations], dtype=np.float64)
+mask = ~(np.isnan(gates) | np.isnan(durs) | np.isnan(heights))
+cfs = np.fromiter((h2cfs.get(h, 0.0) for h in heights[mask]), dtype=np.float64)
+total_spd = float((gates[mask] * durs[mask] * cfs).sum() / 384)
 
 st.header(f'Total SPD rate: {total_spd:,.6f}')